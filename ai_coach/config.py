@@ -12,5 +12,6 @@ class AppConfig(BaseModel):
     rate_limit_period: int = 60
     trace_ttl_days: int = 30
     feedback_ttl_days: int = 90
+    dedupe_trace_prompts: bool = True
 
 settings = AppConfig()
@@ -15,7 +15,10 @@ templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
 
 # Services
 pii_guard = PIIGuard()
-trace_store = TraceStore(storage_path=DATA_DIR / "traces.json")
+trace_store = TraceStore(
+    storage_path=DATA_DIR / "traces.json",
+    dedupe_prompts=settings.dedupe_trace_prompts,
+)
 review_queue = ReviewQueue(storage_path=DATA_DIR / "feedback.json")
 retention_manager = RetentionManager(RetentionPolicy(
     trace_ttl_days=settings.trace_ttl_days,
@@ -1,10 +1,13 @@
+import base64
+import hashlib
 import json
 import logging
 import threading
-from dataclasses import asdict, is_dataclass
+import zlib
+from dataclasses import asdict, dataclass, is_dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, List, Type, TypeVar
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +24,10 @@ class DatetimeEncoder(json.JSONEncoder):
 class JsonStore:
     """ACID-compliant JSON file store for simple persistence."""
 
-    def __init__(self, filepath: Path, data_class: Type[T]):
+    def __init__(self, filepath: Path, data_class: Type[T], indent: Optional[int] = 2):
         self.filepath = filepath
         self.data_class = data_class
+        self.indent = indent
         self.lock = threading.Lock()
         self.items: List[T] = self._load()
 
@@ -40,21 +44,37 @@ class JsonStore:
                         if "created_at" in item and isinstance(item["created_at"], str):
                             item["created_at"] = datetime.fromisoformat(item["created_at"])
                     return [self.data_class(**item) for item in raw_data]
-                except (json.JSONDecodeError, TypeError, ValueError) as e:
+                except json.JSONDecodeError as e:
                     logger.error("Failed to decode JSON from %s: %s", self.filepath, e)
+                except (TypeError, ValueError) as e:
+                    logger.error("Failed to load records from %s: %s", self.filepath, e)
                     return []
+            # Keep the unparseable file so the next save does not overwrite it.
+            corrupt_filepath = self._corrupt_filepath()
+            self.filepath.rename(corrupt_filepath)
+            logger.error("Moved unreadable %s to %s", self.filepath, corrupt_filepath)
+            return []
+
+    def _corrupt_filepath(self) -> Path:
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        candidate = self.filepath.with_name(f"{self.filepath.name}.corrupt.{stamp}")
+        counter = 1
+        while candidate.exists():
+            candidate = self.filepath.with_name(f"{self.filepath.name}.corrupt.{stamp}.{counter}")
+            counter += 1
+        return candidate
 
     def _save(self) -> None:
-        with self.lock:
-            temp_filepath = self.filepath.with_suffix(f".tmp.{threading.get_ident()}")
-            with temp_filepath.open("w") as f:
-                json.dump(
-                    [asdict(item) if is_dataclass(item) else item for item in self.items],
-                    f,
-                    indent=2,
-                    cls=DatetimeEncoder,
-                )
-            temp_filepath.rename(self.filepath)
+        # Callers must hold self.lock.
+        temp_filepath = self.filepath.with_suffix(f".tmp.{threading.get_ident()}")
+        with temp_filepath.open("w") as f:
+            json.dump(
+                [asdict(item) if is_dataclass(item) else item for item in self.items],
+                f,
+                indent=self.indent,
+                cls=DatetimeEncoder,
+            )
+        temp_filepath.rename(self.filepath)
 
     def add(self, item: T) -> None:
         with self.lock:
@@ -69,3 +89,92 @@ class JsonStore:
         with self.lock:
             self.items = items
             self._save()
+
+
+@dataclass
+class Blob:
+    digest: str
+    data: str
+
+
+class BlobStore:
+    """Content-addressed store of zlib-compressed text blobs.
+
+    Reference counts are kept in memory only: owners declare the digests they
+    hold with ``retain`` after loading, so a refcount change never rewrites the
+    blob file.
+    """
+
+    def __init__(self, filepath: Path, compression_level: int = 6):
+        self.store = JsonStore(filepath, Blob, indent=None)
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+        self._index: Dict[str, Blob] = {blob.digest: blob for blob in self.store.get_all()}
+        self._refcounts: Dict[str, int] = {}
+
+    @staticmethod
+    def digest_of(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def retain(self, digests: Iterable[str]) -> None:
+        with self.lock:
+            for digest in digests:
+                self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+
+    def put(self, text: str) -> str:
+        return self.put_many([text])[0]
+
+    def put_many(self, texts: Iterable[str]) -> List[str]:
+        """Store texts and take one reference each; the file is written at most once."""
+        digests = []
+        with self.lock:
+            added = False
+            for text in texts:
+                digest = self.digest_of(text)
+                if digest not in self._index:
+                    compressed = zlib.compress(text.encode("utf-8"), self.compression_level)
+                    self._index[digest] = Blob(digest=digest, data=base64.b64encode(compressed).decode("ascii"))
+                    added = True
+                self._refcounts[digest] = self._refcounts.get(digest, 0) + 1
+                digests.append(digest)
+            if added:
+                self.store.replace_all(list(self._index.values()))
+        return digests
+
+    def get(self, digest: str) -> Optional[str]:
+        with self.lock:
+            blob = self._index.get(digest)
+        if blob is None:
+            return None
+        return zlib.decompress(base64.b64decode(blob.data)).decode("utf-8")
+
+    def refcount(self, digest: str) -> int:
+        with self.lock:
+            return self._refcounts.get(digest, 0)
+
+    def __contains__(self, digest: str) -> bool:
+        with self.lock:
+            return digest in self._index
+
+    def release(self, digests: Iterable[str]) -> int:
+        """Drop one reference per digest and delete blobs nobody references."""
+        with self.lock:
+            for digest in digests:
+                if digest in self._refcounts:
+                    self._refcounts[digest] -= 1
+            return self._delete_unreferenced()
+
+    def prune(self) -> int:
+        """Delete blobs with no references, e.g. ones orphaned by an interrupted write."""
+        with self.lock:
+            return self._delete_unreferenced()
+
+    def _delete_unreferenced(self) -> int:
+        # Callers must hold self.lock.
+        unreferenced = [digest for digest in self._index if self._refcounts.get(digest, 0) <= 0]
+        for digest in unreferenced:
+            del self._index[digest]
+            self._refcounts.pop(digest, None)
+        if unreferenced:
+            self.store.replace_all(list(self._index.values()))
+        return len(unreferenced)
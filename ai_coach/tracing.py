@@ -1,9 +1,14 @@
+import logging
 import time
 import uuid
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
+logger = logging.getLogger(__name__)
+
+MISSING_PROMPT = "[prompt unavailable]"
+
 
 @dataclass
 class TraceRecord:
@@ -19,25 +24,147 @@ class TraceRecord:
     metadata: Dict[str, str] = field(default_factory=dict)
 
 
+@dataclass
+class StoredTrace:
+    """Persisted trace row whose prompt lives in the blob table under ``prompt_hash``."""
+
+    trace_id: str
+    model: str
+    latency_ms: float
+    cost_usd: float
+    prompt_tokens: int
+    completion_tokens: int
+    status: str
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    metadata: Dict[str, str] = field(default_factory=dict)
+    prompt_hash: str = ""
+    # Only set on rows written before prompt deduplication was enabled.
+    prompt: Optional[str] = None
+
+
 import threading
 from pathlib import Path
-from .persistence import JsonStore
+from .persistence import BlobStore, JsonStore
 
 
 class TraceStore:
-    def __init__(self, storage_path: Path) -> None:
-        self.store = JsonStore(storage_path, TraceRecord)
+    def __init__(self, storage_path: Path, dedupe_prompts: bool = False) -> None:
         self.lock = threading.Lock()
+        self.blobs: Optional[BlobStore] = None
+        blob_path = storage_path.with_name(f"{storage_path.stem}_prompts.json")
+        if dedupe_prompts:
+            self.blobs = BlobStore(blob_path)
+            self.store = JsonStore(storage_path, StoredTrace, indent=None)
+            self._load_prompt_refs()
+            return
+        # StoredTrace reads both row formats, so rows left by dedupe mode are
+        # found whether or not their blob table survived.
+        rows_store = JsonStore(storage_path, StoredTrace)
+        if not any(row.prompt is None for row in rows_store.get_all()):
+            self.store = JsonStore(storage_path, TraceRecord)
+            return
+        blobs = BlobStore(blob_path)
+        if self._inline_prompt_refs(rows_store, blobs, blob_path):
+            self.store = JsonStore(storage_path, TraceRecord)
+        else:
+            # Keep serving the hashed rows so a restored blob table can still fill them in.
+            self.blobs = blobs
+            self.store = rows_store
+            self._load_prompt_refs()
+
+    def _inline_prompt_refs(self, rows_store: JsonStore, blobs: BlobStore, blob_path: Path) -> bool:
+        """Rewrite rows left by dedupe mode with their prompts inline again.
+
+        Returns False, leaving the rows untouched, when a prompt is missing from
+        a blob table that exists or was quarantined as unreadable.
+        """
+        quarantined = any(blob_path.parent.glob(f"{blob_path.name}.corrupt.*"))
+        records = []
+        for row in rows_store.get_all():
+            prompt = row.prompt if row.prompt is not None else blobs.get(row.prompt_hash)
+            if prompt is None:
+                if blob_path.exists() or quarantined:
+                    logger.error(
+                        "Trace %s references missing prompt blob %s; keeping hashed traces in %s",
+                        row.trace_id,
+                        row.prompt_hash,
+                        rows_store.filepath,
+                    )
+                    return False
+                logger.warning("Prompt table %s is missing; trace %s gets a placeholder prompt", blob_path, row.trace_id)
+                prompt = MISSING_PROMPT
+            records.append(self._row_to_record(row, prompt))
+        rows_store.replace_all(records)
+        blob_path.unlink(missing_ok=True)
+        return True
+
+    def _load_prompt_refs(self) -> None:
+        rows = self.store.get_all()
+        self.blobs.retain(row.prompt_hash for row in rows if row.prompt is None)
+        legacy = [row for row in rows if row.prompt is not None]
+        if legacy:
+            # Blobs are written before the rows that reference them; if we stop
+            # in between, the rows still hold their prompts and are migrated
+            # again next time, and refcounts are rebuilt from the rows anyway.
+            digests = self.blobs.put_many(row.prompt for row in legacy)
+            for row, digest in zip(legacy, digests):
+                row.prompt_hash = digest
+                row.prompt = None
+            self.store.replace_all(rows)
+        self.blobs.prune()
+
+    def _to_row(self, record: TraceRecord) -> StoredTrace:
+        return StoredTrace(
+            trace_id=record.trace_id,
+            model=record.model,
+            latency_ms=record.latency_ms,
+            cost_usd=record.cost_usd,
+            prompt_tokens=record.prompt_tokens,
+            completion_tokens=record.completion_tokens,
+            status=record.status,
+            created_at=record.created_at,
+            metadata=record.metadata,
+            prompt_hash=self.blobs.put(record.prompt),
+        )
+
+    def _from_row(self, row: StoredTrace) -> TraceRecord:
+        return self._row_to_record(row, self._resolve_prompt(self.blobs, row))
+
+    @staticmethod
+    def _resolve_prompt(blobs: BlobStore, row: StoredTrace) -> str:
+        prompt = blobs.get(row.prompt_hash)
+        if prompt is None:
+            logger.warning("Trace %s references missing prompt blob %s", row.trace_id, row.prompt_hash)
+            return MISSING_PROMPT
+        return prompt
+
+    @staticmethod
+    def _row_to_record(row: StoredTrace, prompt: str) -> TraceRecord:
+        return TraceRecord(
+            trace_id=row.trace_id,
+            prompt=prompt,
+            model=row.model,
+            latency_ms=row.latency_ms,
+            cost_usd=row.cost_usd,
+            prompt_tokens=row.prompt_tokens,
+            completion_tokens=row.completion_tokens,
+            status=row.status,
+            created_at=row.created_at,
+            metadata=row.metadata,
+        )
 
     def add(self, record: TraceRecord) -> TraceRecord:
         with self.lock:
-            self.store.add(record)
+            self.store.add(self._to_row(record) if self.blobs else record)
         return record
 
     def list_recent(self, limit: int = 50) -> List[TraceRecord]:
         with self.lock:
             records = self.store.get_all()
-        return sorted(records, key=lambda r: r.created_at, reverse=True)[:limit]
+            recent = sorted(records, key=lambda r: r.created_at, reverse=True)[:limit]
+            if self.blobs:
+                return [self._from_row(row) for row in recent]
+            return recent
 
     def purge_older_than(self, cutoff: datetime) -> int:
         with self.lock:
@@ -45,6 +172,8 @@ class TraceStore:
             before = len(records)
             surviving = [r for r in records if r.created_at >= cutoff]
             self.store.replace_all(surviving)
+            if self.blobs:
+                self.blobs.release(r.prompt_hash for r in records if r.created_at < cutoff)
             return before - len(surviving)
 
 
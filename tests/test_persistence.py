@@ -0,0 +1,37 @@
+import json
+
+from ai_coach.persistence import JsonStore
+from ai_coach.review_queue import FeedbackItem, ReviewQueue
+
+
+def test_corrupt_feedback_file_is_moved_aside(tmp_path):
+    path = tmp_path / "feedback.json"
+    path.write_text("[{broken")
+
+    queue = ReviewQueue(storage_path=path)
+    assert queue.list_items() == []
+    queue.submit(category="bias", description="after corruption")
+
+    backups = list(tmp_path.glob("feedback.json.corrupt.*"))
+    assert [backup.read_text() for backup in backups] == ["[{broken"]
+    assert len(json.loads(path.read_text())) == 1
+
+
+def test_repeated_corruption_keeps_every_backup(tmp_path):
+    path = tmp_path / "feedback.json"
+    for payload in ["{first", "{second"]:
+        path.write_text(payload)
+        JsonStore(path, FeedbackItem)
+
+    backups = sorted(backup.read_text() for backup in tmp_path.glob("feedback.json.corrupt.*"))
+    assert backups == ["{first", "{second"]
+    assert not path.exists()
+
+
+def test_schema_mismatch_is_not_quarantined(tmp_path):
+    path = tmp_path / "feedback.json"
+    path.write_text(json.dumps([{"unexpected": "field"}]))
+
+    assert JsonStore(path, FeedbackItem).get_all() == []
+    assert path.exists()
+    assert not list(tmp_path.glob("feedback.json.corrupt.*"))
@@ -0,0 +1,152 @@
+import json
+from datetime import datetime, timedelta
+
+from ai_coach.persistence import BlobStore
+from ai_coach.tracing import MISSING_PROMPT, TraceStore, build_trace
+
+
+def make_trace(prompt, age_days=0):
+    record = build_trace(
+        prompt=prompt,
+        model="gpt-test",
+        prompt_tokens=3,
+        completion_tokens=5,
+        latency_ms=12.5,
+        cost_usd=0.001,
+        status="ok",
+        metadata={"route": "ai-call"},
+    )
+    record.created_at = datetime.utcnow() - timedelta(days=age_days)
+    return record
+
+
+def as_dicts(store):
+    return [trace.__dict__ for trace in store.list_recent(limit=100)]
+
+
+def test_identical_prompts_share_one_blob(tmp_path):
+    store = TraceStore(tmp_path / "traces.json", dedupe_prompts=True)
+    for prompt in ["same", "same", "same", "other"]:
+        store.add(make_trace(prompt))
+
+    blobs = json.loads((tmp_path / "traces_prompts.json").read_text())
+    assert len(blobs) == 2
+    digest = store.blobs.digest_of("same")
+    assert store.blobs.refcount(digest) == 3
+
+    rows = json.loads((tmp_path / "traces.json").read_text())
+    assert all(row["prompt"] is None for row in rows)
+    assert sorted(row["prompt_hash"] for row in rows).count(digest) == 3
+
+
+def test_list_recent_matches_with_and_without_dedupe(tmp_path):
+    (tmp_path / "plain").mkdir()
+    (tmp_path / "deduped").mkdir()
+    plain = TraceStore(tmp_path / "plain" / "traces.json")
+    deduped = TraceStore(tmp_path / "deduped" / "traces.json", dedupe_prompts=True)
+    for index, prompt in enumerate(["a", "b", "a"]):
+        record = make_trace(prompt, age_days=index)
+        plain.add(record)
+        deduped.add(record)
+
+    assert as_dicts(deduped) == as_dicts(plain)
+    reloaded = TraceStore(tmp_path / "deduped" / "traces.json", dedupe_prompts=True)
+    assert as_dicts(reloaded) == as_dicts(plain)
+
+
+def test_legacy_traces_migrate_both_ways(tmp_path):
+    path = tmp_path / "traces.json"
+    legacy = TraceStore(path)
+    for prompt in ["x", "y", "x"]:
+        legacy.add(make_trace(prompt))
+    expected = as_dicts(legacy)
+
+    deduped = TraceStore(path, dedupe_prompts=True)
+    assert as_dicts(deduped) == expected
+    rows = json.loads(path.read_text())
+    assert all(row["prompt"] is None and row["prompt_hash"] for row in rows)
+    assert deduped.blobs.refcount(deduped.blobs.digest_of("x")) == 2
+
+    restored = TraceStore(path)
+    assert as_dicts(restored) == expected
+    assert not (tmp_path / "traces_prompts.json").exists()
+    assert all(row["prompt"] in {"x", "y"} for row in json.loads(path.read_text()))
+
+
+def test_interrupted_migration_does_not_double_count(tmp_path):
+    path = tmp_path / "traces.json"
+    legacy = TraceStore(path)
+    legacy.add(make_trace("x"))
+    # A crash after the blob table was written but before the rows were rewritten.
+    BlobStore(tmp_path / "traces_prompts.json").put_many(["x"])
+    digest = BlobStore.digest_of("x")
+
+    migrated = TraceStore(path, dedupe_prompts=True)
+    assert migrated.blobs.refcount(digest) == 1
+    reopened = TraceStore(path, dedupe_prompts=True)
+    assert reopened.blobs.refcount(digest) == 1
+    assert reopened.purge_older_than(datetime.utcnow() + timedelta(days=1)) == 1
+    assert digest not in reopened.blobs
+
+
+def test_purge_deletes_unreferenced_blobs(tmp_path):
+    store = TraceStore(tmp_path / "traces.json", dedupe_prompts=True)
+    store.add(make_trace("old", age_days=40))
+    store.add(make_trace("old", age_days=35))
+    store.add(make_trace("shared", age_days=40))
+    store.add(make_trace("shared"))
+    old_digest = store.blobs.digest_of("old")
+    shared_digest = store.blobs.digest_of("shared")
+
+    removed = store.purge_older_than(datetime.utcnow() - timedelta(days=30))
+
+    assert removed == 3
+    assert store.blobs.refcount(old_digest) == 0
+    assert old_digest not in store.blobs
+    assert store.blobs.refcount(shared_digest) == 1
+    blobs = json.loads((tmp_path / "traces_prompts.json").read_text())
+    assert [blob["digest"] for blob in blobs] == [shared_digest]
+    assert [trace.prompt for trace in store.list_recent()] == ["shared"]
+
+
+def test_missing_blob_yields_placeholder(tmp_path):
+    path = tmp_path / "traces.json"
+    store = TraceStore(path, dedupe_prompts=True)
+    store.add(make_trace("lost"))
+    (tmp_path / "traces_prompts.json").write_text("{not json")
+
+    reloaded = TraceStore(path, dedupe_prompts=True)
+
+    assert [trace.prompt for trace in reloaded.list_recent()] == [MISSING_PROMPT]
+    assert len(list(tmp_path.glob("traces_prompts.json.corrupt.*"))) == 1
+
+
+def test_dedupe_off_with_corrupt_blob_table_keeps_hashed_rows(tmp_path):
+    path = tmp_path / "traces.json"
+    TraceStore(path, dedupe_prompts=True).add(make_trace("kept"))
+    hashed_rows = json.loads(path.read_text())
+    (tmp_path / "traces_prompts.json").write_text("{bad")
+
+    store = TraceStore(path)
+
+    assert [trace.prompt for trace in store.list_recent()] == [MISSING_PROMPT]
+    assert [row["prompt_hash"] for row in json.loads(path.read_text())] == [hashed_rows[0]["prompt_hash"]]
+    assert all(row["prompt"] is None for row in json.loads(path.read_text()))
+    # Still no inlining on the next start, while the quarantined table can be restored.
+    TraceStore(path)
+    assert all(row["prompt"] is None for row in json.loads(path.read_text()))
+
+
+def test_dedupe_off_with_missing_blob_table_inlines_placeholders(tmp_path):
+    path = tmp_path / "traces.json"
+    store = TraceStore(path, dedupe_prompts=True)
+    store.add(make_trace("gone"))
+    store.add(make_trace("also gone", age_days=1))
+    (tmp_path / "traces_prompts.json").unlink()
+
+    restored = TraceStore(path)
+
+    assert [trace.prompt for trace in restored.list_recent()] == [MISSING_PROMPT, MISSING_PROMPT]
+    assert [row["prompt"] for row in json.loads(path.read_text())] == [MISSING_PROMPT, MISSING_PROMPT]
+    assert not list(tmp_path.glob("traces.json.corrupt.*"))
+    assert [trace.prompt for trace in TraceStore(path).list_recent()] == [MISSING_PROMPT, MISSING_PROMPT]